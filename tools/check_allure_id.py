@@ -15,8 +15,12 @@
 from __future__ import annotations
 
 import ast
+from collections import deque
 from collections.abc import Iterable
-from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import hashlib
+import os
+import pickle
 import sys
 
 # Коды ошибок для allure.id
@@ -29,94 +33,123 @@ AID_MULTIPLE = "AID005"  # более одного @allure.id
 AOWN_MISSING = "AOWN001"  # отсутствует @allure.label("owner", ...)
 AOWN_EMPTY = "AOWN002"  # пустое/некорректное значение для owner
 
+# Константы горячего пути: интернированные строки сравниваются по указателю,
+# frozenset вместо кортежа — для членства без линейного прохода
+ALLURE = sys.intern("allure")
+ID_ATTR = sys.intern("id")
+LABEL_ATTR = sys.intern("label")
+OWNER = sys.intern("owner")
+OWNER_KWARGS = frozenset({"value", "owner"})
+
+# O_CLOEXEC есть не везде (Windows), O_BINARY нужен только на Windows —
+# без него текстовый режим транслирует CRLF и чтение по st_size съезжает
+READ_FLAGS = os.O_RDONLY | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0)
+
+# Каталог кэша результатов: ключ — SHA1(версия чекера, путь, mtime_ns, размер),
+# значение — pickle списка ошибок; инвалидация происходит сменой ключа
+CACHE_DIR = os.path.join(".cache", "check_allure_id")
+# Поднимать при любом изменении правил/диагностик: иначе не тронутые файлы
+# продолжат отдавать вердикты старой версии чекера
+CACHE_VERSION = 1
+
+
+def cache_key(path: str, st: os.stat_result) -> str:
+    """Ключ кэша для файла: версия чекера + путь + mtime + размер."""
+    return hashlib.sha1(f"{CACHE_VERSION}\0{path}\0{st.st_mtime_ns}\0{st.st_size}".encode()).hexdigest()
+
+
+def cache_load(key: str) -> list[str] | None:
+    """Возвращает закэшированный список ошибок или None при промахе/повреждении."""
+    try:
+        with open(os.path.join(CACHE_DIR, key), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+
+
+def cache_store(key: str, errors: list[str]) -> None:
+    """Сохраняет список ошибок; пишет во временный файл и атомарно переименовывает."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = os.path.join(CACHE_DIR, f".{key}.{os.getpid()}")
+        with open(tmp, "wb") as f:
+            pickle.dump(errors, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(CACHE_DIR, key))
+    except OSError:
+        pass
+
 
 def is_test_file(path: str) -> bool:
     """Возвращает True, если имя файла соответствует шаблону test_*.py."""
-    name = Path(path).name
+    # os.path.basename вместо Path: без создания PurePath на каждый кандидат
+    name = os.path.basename(path)
     return name.startswith("test_") and name.endswith(".py")
 
 
-def walk_with_parents(tree: ast.AST) -> Iterable[tuple[ast.AST, list[ast.AST]]]:
-    """Итератор по AST с сохранением стека родителей каждого узла."""
-    stack: list[ast.AST] = []
-
-    def _walk(node: ast.AST) -> Iterable[tuple[ast.AST, list[ast.AST]]]:
-        yield node, stack.copy()
-        stack.append(node)
-        for child in ast.iter_child_nodes(node):
-            yield from _walk(child)
-        stack.pop()
-
-    yield from _walk(tree)
-
-
-def is_test_function(node: ast.AST, parents: list[ast.AST]) -> bool:
-    """Определяет, является ли узел тест-функцией pytest (имя начинается с test_)."""
-    if not isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
-        return False
-    if not node.name.startswith("test_"):
-        return False
-    # допускаем верхний уровень и методы классов
-    if not parents:
-        return True
-    parent = parents[-1]
-    return isinstance(parent, ast.Module | ast.ClassDef)
-
-
-def allure_id_calls_from_decorators(func: ast.AST) -> list[ast.Call]:
-    """Возвращает список вызовов @allure.id(...) из декораторов функции (строго только allure.id)."""
-    calls: list[ast.Call] = []
-    for d in func.decorator_list:
-        if isinstance(d, ast.Call):
-            f = d.func
-            # принимаем только @allure.id(...)
-            if isinstance(f, ast.Attribute) and isinstance(f.value, ast.Name):
-                if f.value.id == "allure" and f.attr == "id":
-                    calls.append(d)
-    return calls
-
-
-def allure_owner_label_call(func: ast.AST) -> tuple[ast.Call | None, str | None]:
-    """Возвращает (вызов @allure.label/@owner, значение owner) или (None, None)."""
-    for dec in getattr(func, "decorator_list", []) or []:
+def iter_test_functions(tree: ast.Module) -> Iterable[ast.FunctionDef | ast.AsyncFunctionDef]:
+    """Итератор по тест-функциям модуля: верхний уровень и методы классов.
+
+    Явный стек вместо рекурсивного генератора: один кадр на весь обход.
+    Спускаемся только по операторным блокам (выражения defов содержать не
+    могут), так что классы под условной компиляцией или внутри функций
+    по-прежнему находятся; тест-функцией считается def test_*,
+    непосредственным родителем которого является модуль или класс.
+    """
+    # (узел, является ли его родитель Module/ClassDef)
+    work: deque[tuple[ast.AST, bool]] = deque((n, True) for n in reversed(tree.body))
+    while work:
+        node, eligible = work.pop()
+        if eligible and isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef) and node.name.startswith("test_"):
+            yield node
+        sub_eligible = isinstance(node, ast.ClassDef)
+        for child in reversed(list(ast.iter_child_nodes(node))):
+            if isinstance(child, ast.stmt | ast.excepthandler | ast.match_case):
+                work.append((child, sub_eligible))
+
+
+def owner_value_from_call(dec: ast.Call, pos: int) -> str:
+    """Извлекает значение owner из позиционного аргумента pos или kwargs value/owner."""
+    if len(dec.args) > pos and isinstance(dec.args[pos], ast.Constant) and isinstance(dec.args[pos].value, str):
+        return dec.args[pos].value
+    for kw in dec.keywords or []:
+        if kw.arg in OWNER_KWARGS and isinstance(kw.value, ast.Constant) and isinstance(kw.value.value, str):
+            return kw.value.value
+    return ""
+
+
+def scan_decorators(func: ast.FunctionDef | ast.AsyncFunctionDef) -> tuple[list[ast.Call], ast.Call | None, str | None]:
+    """Один проход по декораторам: (вызовы @allure.id, вызов owner-метки, значение owner).
+
+    Owner-меткой считается первый @allure.label("owner", ...) или @owner(...);
+    при отсутствии — (None, None) в последних двух позициях.
+    """
+    id_calls: list[ast.Call] = []
+    owner_call: ast.Call | None = None
+    owner_value: str | None = None
+    for dec in func.decorator_list:
         if not isinstance(dec, ast.Call):
             continue
         f = dec.func
-        if (
-            isinstance(f, ast.Attribute)
-            and isinstance(f.value, ast.Name)
-            and f.value.id == "allure"
-            and f.attr == "label"
-        ):
-            if not (dec.args and isinstance(dec.args[0], ast.Constant) and dec.args[0].value == "owner"):
-                continue
-            if len(dec.args) >= 2 and isinstance(dec.args[1], ast.Constant) and isinstance(dec.args[1].value, str):
-                return dec, dec.args[1].value
-            for kw in dec.keywords or []:
-                if (
-                    kw.arg in ("value", "owner")
-                    and isinstance(kw.value, ast.Constant)
-                    and isinstance(kw.value.value, str)
-                ):
-                    return dec, kw.value.value
-            return dec, ""
-        if isinstance(f, ast.Name) and f.id == "owner":
-            if dec.args and isinstance(dec.args[0], ast.Constant) and isinstance(dec.args[0].value, str):
-                return dec, dec.args[0].value
-            for kw in dec.keywords or []:
-                if (
-                    kw.arg in ("value", "owner")
-                    and isinstance(kw.value, ast.Constant)
-                    and isinstance(kw.value.value, str)
-                ):
-                    return dec, kw.value.value
-            return dec, ""
-    return None, None
-
-
-def check_allure_id(path: str, node: ast.AST) -> str | None:
-    """Проверяет корректность декоратора allure.id у тест-функции."""
-    calls = allure_id_calls_from_decorators(node)
+        if isinstance(f, ast.Attribute) and isinstance(f.value, ast.Name) and f.value.id == ALLURE:
+            if f.attr == ID_ATTR:
+                id_calls.append(dec)
+            elif (
+                f.attr == LABEL_ATTR
+                and owner_call is None
+                and dec.args
+                and isinstance(dec.args[0], ast.Constant)
+                and dec.args[0].value == OWNER
+            ):
+                owner_call = dec
+                owner_value = owner_value_from_call(dec, 1)
+        elif isinstance(f, ast.Name) and f.id == OWNER and owner_call is None:
+            owner_call = dec
+            owner_value = owner_value_from_call(dec, 0)
+    return id_calls, owner_call, owner_value
+
+
+def check_allure_id(path: str, node: ast.AST, calls: list[ast.Call]) -> str | None:
+    """Проверяет корректность декоратора allure.id у тест-функции по собранным вызовам."""
     line = node.lineno
     col = node.col_offset
 
@@ -131,11 +164,12 @@ def check_allure_id(path: str, node: ast.AST) -> str | None:
         )
 
     if len(calls) > 1:
+        # у ast.Call позиция есть всегда — defensive getattr здесь не нужен
         c = calls[1]
         return err(
             path,
-            getattr(c, "lineno", line),
-            getattr(c, "col_offset", col),
+            c.lineno,
+            c.col_offset,
             AID_MULTIPLE,
             "над одной тест-функцией должен быть ровно один @allure.id",
         )
@@ -161,27 +195,10 @@ def check_allure_id(path: str, node: ast.AST) -> str | None:
         )
 
     arg = call.args[0]
-    v = arg.value
-
-    if isinstance(v, str):
-        # только цифры, без пробелов/знаков/букв и без ведущих нулей
-        if v == "0" or not v.isdigit():
-            return err(
-                path,
-                call.lineno,
-                call.col_offset,
-                AID_BAD_LITERAL,
-                "строка в allure.id должна содержать только цифры и быть больше 0",
-            )
-        elif len(v) > 1 and v[0] == "0":
-            return err(
-                path,
-                call.lineno,
-                call.col_offset,
-                AID_BAD_LITERAL,
-                "строка в allure.id не должна иметь ведущих нулей",
-            )
-    else:
+    v = arg.value if isinstance(arg, ast.Constant) else None
+
+    if not isinstance(v, str):
+        # не-литерал (имя, выражение) или литерал неподходящего типа
         return err(
             path,
             call.lineno,
@@ -190,12 +207,20 @@ def check_allure_id(path: str, node: ast.AST) -> str | None:
             "аргумент allure.id должен быть строкой из цифр",
         )
 
+    # только цифры, без пробелов/знаков/букв и без ведущих нулей;
+    # валидное значение проходит ровно один составной предикат
+    if not v.isdigit() or v[0] == "0":
+        if not v.isdigit() or v == "0":
+            msg = "строка в allure.id должна содержать только цифры и быть больше 0"
+        else:
+            msg = "строка в allure.id не должна иметь ведущих нулей"
+        return err(path, call.lineno, call.col_offset, AID_BAD_LITERAL, msg)
+
 
-def check_allure_owner(path: str, node: ast.AST) -> str | None:
-    """Проверяет наличие и корректность owner-метки у тест-функции."""
+def check_allure_owner(path: str, node: ast.AST, call: ast.Call | None, value: str | None) -> str | None:
+    """Проверяет наличие и корректность owner-метки у тест-функции по собранным данным."""
     line = node.lineno
     col = node.col_offset
-    call, value = allure_owner_label_call(node)
     if call is None and value is None:
         return err(
             path,
@@ -205,8 +230,9 @@ def check_allure_owner(path: str, node: ast.AST) -> str | None:
             f"отсутствует @allure.label(\"owner\", ...) у теста '{node.name}'",
         )
 
-    c_line = getattr(call, "lineno", line)
-    c_col = getattr(call, "col_offset", col)
+    # после раннего выхода call не None, а у ast.Call позиция есть всегда
+    c_line = call.lineno
+    c_col = call.col_offset
     if value is None or value.strip() == "":
         return err(
             path,
@@ -218,38 +244,88 @@ def check_allure_owner(path: str, node: ast.AST) -> str | None:
     return None
 
 
+def check_test_function(path: str, node: ast.FunctionDef | ast.AsyncFunctionDef) -> list[str]:
+    """Все проверки одной тест-функции поверх единственного прохода по декораторам."""
+    id_calls, owner_call, owner_value = scan_decorators(node)
+    out: list[str] = []
+    if e := check_allure_id(path, node, id_calls):
+        out.append(e)
+    if e := check_allure_owner(path, node, owner_call, owner_value):
+        out.append(e)
+    return out
+
+
 def err(path: str, line: int, col: int, code: str, msg: str) -> str:
     """Форматирует сообщение об ошибке в стиле flake8."""
-    return f"{path}:{line}:{col} {code} {msg}"
+    # %-форматирование выполняется одной C-процедурой, без цепочки FORMAT_VALUE
+    return "%s:%d:%d %s %s" % (path, line, col, code, msg)  # noqa: UP031
 
 
 def check_file(path: str) -> list[str]:
-    """Проверяет один файл и возвращает список строк-ошибок."""
-    if not is_test_file(path):
-        return []
+    """Проверяет один файл и возвращает список строк-ошибок.
 
+    Фильтрация по имени (test_*.py) выполняется в main до постановки в очередь.
+    """
     try:
-        src = Path(path).read_text(encoding="utf-8")
-    except Exception as e:
+        # одно чтение целиком через низкоуровневые вызовы: open+fstat+read+close
+        # вместо Path.read_text с его TextIOWrapper и лишними syscall'ами
+        fd = os.open(path, READ_FLAGS)
+        try:
+            # fstat по уже открытому fd: и размер для чтения, и ключ кэша без лишнего stat
+            st = os.fstat(fd)
+            key = cache_key(path, st)
+            if (cached := cache_load(key)) is not None:
+                return cached
+            if st.st_size == 0:
+                return []
+            # размер известен из fstat — читаем одним вызовом, без probe до EOF;
+            # короткое чтение дочитываем (сигналы, специальные ФС)
+            data = os.read(fd, st.st_size)
+            while len(data) < st.st_size:
+                chunk = os.read(fd, st.st_size - len(data))
+                if not chunk:
+                    break
+                data += chunk
+        finally:
+            os.close(fd)
+    except OSError as e:
+        # единственное, что реально бросают open/fstat/read; узкий except
+        # не маскирует программные ошибки и дешевле для интерпретатора
         return [err(path, 1, 0, "AID000", f"не удалось прочитать файл: {e}")]
 
+    # Быстрый путь: имя тест-функции обязано содержать "test_" буквально,
+    # так что без этой подстроки ast.parse можно не вызывать; поиск по сырым
+    # байтам — до затрат на декодирование. Никакого "def " в шаблоне:
+    # `def  test_x` / `def\ttest_x` — валидные определения
+    if b"test_" not in data:
+        cache_store(key, [])
+        return []
+
     try:
-        tree = ast.parse(src, filename=path)
+        src = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # это проблема содержимого, а не чтения — диагностируем отдельно
+        errors = [err(path, 1, 0, "AID000", f"файл не в кодировке UTF-8: {e.reason}")]
+        cache_store(key, errors)
+        return errors
+
+    try:
+        # прямой compile вместо обёртки ast.parse: dont_inherit отсекает флаги
+        # __future__ вызывающего кода, optimize=2 разрешает интерпретатору
+        # не сохранять docstring/assert там, где он это умеет
+        tree: ast.Module = compile(src, path, "exec", flags=ast.PyCF_ONLY_AST, dont_inherit=True, optimize=2)
     except SyntaxError as e:
-        return [err(path, e.lineno or 1, 0, "AID000", f"синтаксическая ошибка: {e.msg}")]
+        errors = [err(path, e.lineno or 1, 0, "AID000", f"синтаксическая ошибка: {e.msg}")]
+        cache_store(key, errors)
+        return errors
 
     errors: list[str] = []
+    errors_extend = errors.extend  # без поиска метода на каждой итерации
 
-    for node, parents in walk_with_parents(tree):
-        if not is_test_function(node, parents):
-            continue
-
-        if e := check_allure_id(path, node):
-            errors.append(e)
-
-        if e := check_allure_owner(path, node):
-            errors.append(e)
+    for node in iter_test_functions(tree):
+        errors_extend(check_test_function(path, node))
 
+    cache_store(key, errors)
     return errors
 
 
@@ -259,11 +335,26 @@ def main(argv: list[str] | None = None) -> int:
     Код 1 — если найдены ошибки, иначе 0.
     """
     argv = sys.argv[1:] if argv is None else argv
+    # единственная проверка имени: is_test_file уже включает суффикс .py
+    py_files: list[str] = [p for p in argv if is_test_file(p)]
     any_err = False
-    for p in argv:
-        if not p.endswith(".py"):
-            continue
-        for e in check_file(p):
+    results: list[list[str]]
+    if not py_files:
+        results = []
+    elif len(py_files) < 4:
+        # на паре файлов накладные расходы на запуск процессов не окупаются;
+        # потоки дают перекрытие I/O и парсинга: os.read отпускает GIL, так что
+        # чтение файла N+1 идёт, пока компилируется AST файла N (важно на NFS)
+        with ThreadPoolExecutor(max_workers=len(py_files)) as tp:
+            results = list(tp.map(check_file, py_files))
+    else:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(py_files))) as ex:
+            # map сохраняет порядок аргументов, поэтому вывод остаётся детерминированным;
+            # chunksize=1: на файл приходится достаточно работы, а чанки больше
+            # единицы оставляют малые батчи (4-8 файлов) одному воркеру
+            results = list(ex.map(check_file, py_files, chunksize=1))
+    for errs in results:
+        for e in errs:
             any_err = True
             print(e)
     return 1 if any_err else 0